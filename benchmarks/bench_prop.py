@@ -0,0 +1,95 @@
+"""
+Benchmark `expect.prop` None propagation.
+
+Compares a chain of `expect.prop` statements with hand-written early returns and with
+propagation by raising and catching an exception, both when every value is present and
+when the first value is `None`.
+
+Run with `python benchmarks/bench_prop.py` from the repository root.
+"""
+
+from functools import partial
+from io import BytesIO
+from timeit import timeit
+from tokenize import tokenize
+
+from expect.importer import _tokens_to_module
+
+SOURCE = """
+class Missing(Exception):
+    pass
+
+
+def unwrap(value):
+    if value is None:
+        raise Missing
+    return value
+
+
+def get(mapping, key):
+    return mapping.get(key)
+
+
+def with_prop(config):
+    a = expect.prop get(config, "a")
+    b = expect.prop get(a, "b")
+    c = expect.prop get(b, "c")
+    return c
+
+
+def with_early_return(config):
+    a = get(config, "a")
+    if a is None:
+        return None
+    b = get(a, "b")
+    if b is None:
+        return None
+    c = get(b, "c")
+    if c is None:
+        return None
+    return c
+
+
+def with_exception(config):
+    try:
+        a = unwrap(get(config, "a"))
+        b = unwrap(get(a, "b"))
+        return unwrap(get(b, "c"))
+    except Missing:
+        return None
+"""
+
+INPUTS = {
+    "present": {"a": {"b": {"c": 1}}},
+    "missing": {},
+}
+
+NAMES = ("with_prop", "with_early_return", "with_exception")
+
+NUMBER = 200_000
+
+REPEAT = 5
+
+
+def main():
+    tokens = tokenize(BytesIO(SOURCE.strip("\r\n").encode("utf-8")).readline)
+    module = _tokens_to_module(tokens, "bench_module")
+    funcs = {name: getattr(module, name) for name in NAMES}
+    # Warm up every function on every input before timing any, so that none of them
+    # absorbs the interpreter's warm-up.
+    for func in funcs.values():
+        for config in INPUTS.values():
+            timeit(partial(func, config), number=NUMBER // 10)
+    for input_label, config in INPUTS.items():
+        # Interleave the repeats, so that changes in the machine's speed affect all.
+        best = dict.fromkeys(NAMES, float("inf"))
+        for _ in range(REPEAT):
+            for name, func in funcs.items():
+                time = timeit(partial(func, config), number=NUMBER)
+                best[name] = min(best[name], time)
+        for name in NAMES:
+            print(f"{input_label:>8} {name:>18}: {best[name] / NUMBER * 1e9:7.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
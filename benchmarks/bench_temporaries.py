@@ -0,0 +1,73 @@
+"""
+Benchmark the temporaries bound by `expect` in tight loops.
+
+Compares a loop of `expect` conditional expressions with the equivalent hand-written
+Python, both at module scope (where temporaries are namespace entries) and inside a
+function (where they are fast locals).
+
+Run with `python benchmarks/bench_temporaries.py` from the repository root.
+"""
+
+from io import BytesIO
+from time import perf_counter
+from tokenize import tokenize
+
+from expect.importer import _tokens_to_module
+
+N = 1_000_000
+
+MODULE_SCOPE_EXPECT = f"""
+for i in range({N}):
+    a = expect i else 0
+    b = expect None else i
+"""
+
+MODULE_SCOPE_PLAIN = f"""
+for i in range({N}):
+    a = i if i is not None else 0
+    b = None if None is not None else i
+"""
+
+FUNCTION_SCOPE_EXPECT = f"""
+def main():
+    for i in range({N}):
+        a = expect i else 0
+        b = expect None else i
+
+main()
+"""
+
+FUNCTION_SCOPE_PLAIN = f"""
+def main():
+    for i in range({N}):
+        a = i if i is not None else 0
+        b = None if None is not None else i
+
+main()
+"""
+
+
+def _time_source(src: str) -> float:
+    """Return the time taken to load a module from `src`, in seconds."""
+    tokens = tokenize(BytesIO(src.strip("\r\n").encode("utf-8")).readline)
+    start = perf_counter()
+    _tokens_to_module(tokens, "bench_module")
+    return perf_counter() - start
+
+
+def main():
+    for label, expect_src, plain_src in (
+        ("module scope", MODULE_SCOPE_EXPECT, MODULE_SCOPE_PLAIN),
+        ("function scope", FUNCTION_SCOPE_EXPECT, FUNCTION_SCOPE_PLAIN),
+    ):
+        expect_time = min(_time_source(expect_src) for _ in range(5))
+        plain_time = min(_time_source(plain_src) for _ in range(5))
+        print(
+            f"{label:>14}: expect {expect_time * 1e3:8.2f} ms, "
+            f"plain {plain_time * 1e3:8.2f} ms, "
+            f"ratio {expect_time / plain_time:5.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+The transform cache.
+
+Transformed modules are compiled once and their code is stored in `__pycache__` next to
+the source, so that later imports can skip reading, tokenizing and transforming it.
+Entries are validated against a hash of the source and are kept separately for each
+optimization level, like the interpreter's own `.pyc` files.
+
+Setting the `EXPECTPYCACHEPREFIX` environment variable (or `prefix`) stores entries in a
+separate tree mirroring the source directories, in the same way as
+`PYTHONPYCACHEPREFIX`, and falls back to `sys.pycache_prefix` when that is set. Such a
+directory can be shared by many processes and users: entries are named by the hash of
+their source so different versions of a module never collide, they are written
+atomically, and a lock per directory lets a single process transform a module while
+others wait. Entries are never removed from the tree; delete it to reclaim space.
+
+Directories and files under the prefix are created writable by their group whatever
+the umask, and directories pass their group on to new files. The prefix should belong
+to a group shared by its users, who must trust each other: anyone able to write to the
+cache can change the code that the others run.
+"""
+
+import hashlib
+import marshal
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from importlib.util import MAGIC_NUMBER, source_hash
+from types import CodeType
+from typing import FrozenSet, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# The compiled code of a module and the names of the temporaries it binds.
+CacheEntry = Tuple[CodeType, FrozenSet[str]]
+
+# Permissions of the directories and files created under `prefix`.
+SHARED_DIRECTORY_MODE = 0o2775
+SHARED_FILE_MODE = 0o664
+
+# Name of the lock file held while writing an entry in its directory.
+LOCK_NAME = "expect.lock"
+
+
+def _transformer_version() -> str:
+    """Return a version identifying the transformer that cached code comes from."""
+    try:
+        with open(os.path.join(os.path.dirname(__file__), "importer.py"), "rb") as f:
+            data = f.read()
+    except OSError:
+        # Only imported here, as importing `importlib.metadata` is slow.
+        from importlib import metadata  # pylint: disable=import-outside-toplevel
+
+        try:
+            data = metadata.version("expect").encode("utf-8")
+        except metadata.PackageNotFoundError:
+            data = b"unknown"
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+# Entries from other versions of the transformer are never loaded, so that upgrading
+# `expect` cannot run stale transforms.
+TRANSFORMER_VERSION = _transformer_version()
+
+HEADER_SIZE = len(MAGIC_NUMBER) + 16
+
+# Root of a cache tree shared between processes, or `None` to use `__pycache__`.
+prefix = os.environ.get("EXPECTPYCACHEPREFIX") or sys.pycache_prefix
+
+
+def cache_path(source_path: str, source: bytes, optimization: int) -> str:
+    """
+    Return the path of the cache entry for `source` read from `source_path`.
+
+    `mod.py` is cached as `__pycache__/mod.<cache tag>.expect-<version>.pyc`, with
+    `.opt-N` added before the `.pyc` for non-zero optimization levels and `<version>`
+    the `TRANSFORMER_VERSION`. With a `prefix` the `__pycache__` directory is replaced
+    by the source's directory under the prefix, and the hash of the source follows
+    `mod`.
+    """
+    directory, filename = os.path.split(os.path.abspath(source_path))
+    stem = os.path.splitext(filename)[0]
+    if prefix:
+        directory = os.path.join(
+            prefix, os.path.splitdrive(directory)[1].lstrip(os.sep)
+        )
+        stem = f"{stem}.{hashlib.sha256(source).hexdigest()[:32]}"
+    else:
+        directory = os.path.join(directory, "__pycache__")
+    level = f".opt-{optimization}" if optimization else ""
+    tag = sys.implementation.cache_tag
+    name = f"{stem}.{tag}.expect-{TRANSFORMER_VERSION}{level}.pyc"
+    return os.path.join(directory, name)
+
+
+def _header(source: bytes) -> bytes:
+    """Return the header identifying a cache entry for `source`."""
+    return MAGIC_NUMBER + bytes.fromhex(TRANSFORMER_VERSION) + source_hash(source)
+
+
+def read(path: str, source: bytes) -> Optional[CacheEntry]:
+    """Return the cache entry at `path` if it is valid for `source`, else `None`."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:HEADER_SIZE] != _header(source):
+        return None
+    try:
+        code, temporaries = marshal.loads(data[HEADER_SIZE:])
+    except (EOFError, TypeError, ValueError):
+        return None
+    return code, temporaries
+
+
+def write(path: str, source: bytes, entry: CacheEntry) -> None:
+    """
+    Store `entry` for `source` at `path`; failures are ignored.
+
+    The entry is written to a temporary file that is then renamed over `path`, so
+    readers never see a partially written entry. In `__pycache__`, entries left for the
+    same module by other versions of the transformer are removed.
+    """
+    if sys.dont_write_bytecode:
+        return
+    data = _header(source) + marshal.dumps(entry)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        _makedirs(os.path.dirname(path))
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        with open(fd, "wb") as f:
+            f.write(data)
+        if prefix:
+            os.chmod(temp_path, SHARED_FILE_MODE)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        return
+    if not prefix:
+        _prune(path)
+
+
+def _prune(path: str) -> None:
+    """Remove the entries that differ from `path` only in their transformer version."""
+    directory, name = os.path.split(path)
+    before, version, after = name.partition(f"expect-{TRANSFORMER_VERSION}")
+    if not version:
+        return
+    stale = re.compile(f"{re.escape(before)}expect-[0-9a-f]{{16}}{re.escape(after)}")
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for other in names:
+        if other != name and stale.fullmatch(other):
+            try:
+                os.unlink(os.path.join(directory, other))
+            except OSError:
+                pass
+
+
+def _makedirs(directory: str) -> None:
+    """Create `directory` and its parents, shared with their group under `prefix`."""
+    if not prefix:
+        os.makedirs(directory, exist_ok=True)
+        return
+    missing = []
+    while not os.path.isdir(directory):
+        missing.append(directory)
+        directory = os.path.dirname(directory)
+    for path in reversed(missing):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            continue
+        os.chmod(path, SHARED_DIRECTORY_MODE)
+
+
+@contextmanager
+def lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the directory of the cache entry at `path`.
+
+    Other processes locking an entry in the same directory block until it is released.
+    A single lock file is kept per directory. Where locking is unavailable, or the
+    entry will not be written, this does nothing.
+    """
+    if fcntl is None or sys.dont_write_bytecode:
+        yield
+        return
+    lock_path = os.path.join(os.path.dirname(path), LOCK_NAME)
+    try:
+        _makedirs(os.path.dirname(path))
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+    except OSError:
+        yield
+        return
+    try:
+        if prefix:
+            try:
+                os.chmod(lock_path, SHARED_FILE_MODE)
+            except OSError:
+                pass  # Owned by another user, who created it shared.
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
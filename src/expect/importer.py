@@ -5,21 +5,81 @@ This module locates imported objects, converts uses of `expect` and generates a
 using that modified code.
 """
 
+import ast
 import importlib
 import sys
-from tokenize import tokenize, untokenize, TokenInfo, NAME, NEWLINE, OP
-from types import ModuleType
-from typing import Generator, List, Tuple
+from bisect import bisect_right
+from io import BytesIO
+from itertools import count
+from tokenize import (
+    tokenize,
+    untokenize,
+    TokenInfo,
+    COMMENT,
+    DEDENT,
+    ENCODING,
+    ENDMARKER,
+    INDENT,
+    NAME,
+    NEWLINE,
+    NL,
+    OP,
+)
+from types import CodeType, ModuleType
+from typing import (
+    Dict,
+    FrozenSet,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from expect import cache
+
+# Prefix of the temporary names bound by the generated walrus expressions.
+# Each `expect` site gets its own name so that sites never clobber each other or user
+# variables, and inside functions the temporaries remain fast locals. Names take the
+# form `__expect_<n>__`: dunder names are never mangled and are not turned into members
+# by `Enum` and similar class namespaces.
+TEMPORARY_PREFIX = "__expect_"
+
+# Keywords that begin compound statements.
+COMPOUND_KEYWORDS = frozenset(
+    (
+        "async",
+        "class",
+        "def",
+        "elif",
+        "else",
+        "except",
+        "finally",
+        "for",
+        "if",
+        "try",
+        "while",
+        "with",
+    )
+)
+
+# Keywords after which part of a statement may not be evaluated.
+CONDITIONAL_KEYWORDS = frozenset(("and", "assert", "for", "lambda", "or"))
+
+# Comparison operators, which short-circuit when chained.
+COMPARISON_OPERATORS = frozenset(("<", ">", "==", "!=", "<=", ">=", "in", "is", "not"))
 
 
 class ExpectParse(Exception):
     pass
 
 
-def _add_offset(token: TokenInfo, offset: int) -> TokenInfo:
-    """Shift a token's start and end location in a row by `offset`"""
-    new_start = _pad_pos(token.start, offset)
-    new_end = _pad_pos(token.end, offset)
+def _add_offset(token: TokenInfo, offset: int, rows: int = 0) -> TokenInfo:
+    """Shift a token's start and end location by `offset` columns and `rows` rows"""
+    new_start = token.start[0] + rows, token.start[1] + offset
+    new_end = token.end[0] + rows, token.end[1] + offset
     # noinspection PyArgumentList
     return TokenInfo(token.type, token.string, new_start, new_end, token.line)
 
@@ -29,6 +89,25 @@ def _pad_pos(pos: Tuple[int, int], offset: int) -> Tuple[int, int]:
     return pos[0], pos[1] + offset
 
 
+def _temporary_names(reserved: Set[str]) -> Iterator[str]:
+    """Yield unique temporary names that do not collide with any in `reserved`."""
+    for index in count():
+        name = f"{TEMPORARY_PREFIX}{index}__"
+        if name not in reserved:
+            yield name
+
+
+def _release_temporaries(module: ModuleType, names: FrozenSet[str]) -> None:
+    """
+    Remove temporaries left in the namespace of `module` after it has executed.
+
+    Temporaries at module and class scope are deleted by the generated code (see
+    `_delete_temporaries`). This is a safeguard against any left at module scope.
+    """
+    for name in names:
+        module.__dict__.pop(name, None)
+
+
 def expect_import(module_name: str) -> ModuleType:
     """Load the named module, convert `expect` usages and return it."""
     # First, try to import the module without parsing except clauses.
@@ -43,9 +122,20 @@ def expect_import(module_name: str) -> ModuleType:
         module_path = exc.filename
 
     with open(module_path, "rb") as f:
-        tokens = tokenize(f.readline)
+        source = f.read()
+
+    path = cache.cache_path(module_path, source, sys.flags.optimize)
+    entry = cache.read(path, source)
+    if entry is None:
+        # Only one process transforms a module; the others wait and load its result.
+        with cache.lock(path):
+            entry = cache.read(path, source)
+            if entry is None:
+                entry = _source_to_code(source, module_path)
+                cache.write(path, source, entry)
+    del source
 
-    module = _tokens_to_module(tokens, module_name)
+    module = _code_to_module(*entry, module_name)
     sys.modules[module_name] = module
 
     return module
@@ -55,15 +145,556 @@ def _tokens_to_module(
     tokens: Generator[TokenInfo, None, None], module_name: str
 ) -> ModuleType:
     """Convert a token stream using `expect` to a module and return it."""
-    modified_tokens = _modify_tokens(tokens)
-    modified_str = untokenize(modified_tokens).decode("utf-8")
+    return _code_to_module(*_tokens_to_code(tokens), module_name)
+
+
+def _source_to_code(source: bytes, filename: str) -> cache.CacheEntry:
+    """Convert source using `expect` to code and the temporaries it binds."""
+    return _tokens_to_code(tokenize(BytesIO(source).readline), filename)
+
+
+def _tokens_to_code(
+    tokens: Iterable[TokenInfo], filename: str = "<string>"
+) -> cache.CacheEntry:
+    """
+    Convert a token stream using `expect` to code and the temporaries it binds.
+
+    The code is compiled at the interpreter's optimization level, so `-O` and `-OO`
+    strip asserts and docstrings as they do for ordinary modules. The intermediate
+    tokens, source and tree are released when this returns, before the module runs.
+    """
+    tokens = list(tokens)
+    inserted_rows = []
+    modified_tokens = _modify_tokens(tokens, inserted_rows)
+    temporaries = frozenset(
+        name
+        for name in _names(modified_tokens) - _names(tokens)
+        if name.startswith(TEMPORARY_PREFIX)
+    )
+    modified_tokens = _delete_temporaries(modified_tokens, temporaries, inserted_rows)
+    tree = ast.parse(untokenize(modified_tokens).decode("utf-8"))
+    del tokens, modified_tokens
+    _restore_line_numbers(tree, inserted_rows)
+    return compile(tree, filename, "exec", optimize=sys.flags.optimize), temporaries
+
+
+def _code_to_module(
+    code: CodeType, temporaries: FrozenSet[str], module_name: str
+) -> ModuleType:
+    """Execute code in a new module, release its temporaries and return it."""
     module = ModuleType(module_name)
-    exec(modified_str, module.__dict__)  # pylint: disable=exec-used
+    exec(code, module.__dict__)  # pylint: disable=exec-used
+    _release_temporaries(module, temporaries)
     return module
 
 
-def _modify_tokens(tokens: Generator[TokenInfo, None, None]) -> List[TokenInfo]:
-    """Modify a token stream to replace `except` with valid Python."""
+def _names(tokens: Iterable[TokenInfo]) -> Set[str]:
+    """Return the set of names used in a token stream."""
+    return {token.string for token in tokens if token.type == NAME}
+
+
+def _logical_lines(
+    tokens: Iterable[TokenInfo],
+) -> Iterator[Tuple[List[TokenInfo], List[TokenInfo]]]:
+    """
+    Split a token stream into logical lines.
+
+    Each line is yielded as the tokens preceding its statement (encoding, comments,
+    blank lines, indents and dedents) and the tokens of the statement, up to and
+    including its NEWLINE.
+    """
+    preamble = []
+    statement = []
+    for token in tokens:
+        if not statement and token.type in (
+            ENCODING,
+            COMMENT,
+            NL,
+            INDENT,
+            DEDENT,
+            ENDMARKER,
+        ):
+            preamble.append(token)
+            continue
+        statement.append(token)
+        if token.type == NEWLINE:
+            yield preamble, statement
+            preamble, statement = [], []
+    if preamble or statement:
+        yield preamble, statement
+
+
+def _scoped_lines(
+    tokens: Iterable[TokenInfo],
+) -> Iterator[Tuple[List[TokenInfo], List[TokenInfo], bool]]:
+    """
+    Split a token stream into logical lines, as `_logical_lines`, with their scope.
+
+    The third item of each line is whether the innermost `def` or `class` enclosing
+    the statement is a `def`, that is whether names it binds are function locals.
+    """
+    blocks = []
+    opens_function = False
+    for preamble, statement in _logical_lines(tokens):
+        for token in preamble:
+            if token.type == INDENT:
+                blocks.append(opens_function)
+            elif token.type == DEDENT:
+                blocks.pop()
+        in_function = bool(blocks) and blocks[-1]
+        yield preamble, statement, in_function
+        keyword = statement[0].string if statement else ""
+        if keyword in ("async", "def"):
+            opens_function = True
+        elif keyword == "class":
+            opens_function = False
+        else:
+            opens_function = in_function
+
+
+def _place(
+    parts: List[Tuple[int, str, int]], start: Tuple[int, int], line: str
+) -> List[TokenInfo]:
+    """Lay out `(type, string, spaces before)` parts as tokens in a row from `start`."""
+    row, col = start
+    placed = []
+    for token_type, string, spaces in parts:
+        col += spaces
+        # noinspection PyArgumentList
+        placed.append(
+            TokenInfo(token_type, string, (row, col), (row, col + len(string)), line)
+        )
+        col += len(string)
+    return placed
+
+
+def _is_compound(statement: List[TokenInfo]) -> bool:
+    """Return whether a statement is, or starts with, a compound statement header."""
+    significant = [token for token in statement if token.type not in (COMMENT, NL)]
+    first = significant[0]
+    last = significant[-2] if significant[-1].type == NEWLINE else significant[-1]
+    return (
+        (first.type == NAME and first.string in COMPOUND_KEYWORDS)
+        or (first.type == OP and first.string == "@")
+        or (last.type == OP and last.string == ":")
+    )
+
+
+def _may_skip_binding(statement: List[TokenInfo], names: List[str]) -> bool:
+    """
+    Return whether any of `names` might not be bound when `statement` completes.
+
+    This is conservative: a statement is only treated as always binding its
+    temporaries when nothing in it, other than the generated conditional expressions,
+    can skip evaluating part of it.
+    """
+    strings = [token.string for token in statement if token.type in (NAME, OP)]
+    if CONDITIONAL_KEYWORDS.intersection(strings) or strings.count("if") > len(names):
+        return True
+    # A chain of comparisons stops at the first that is false. Each generated
+    # conditional expression compares with `is not`.
+    comparisons = sum(strings.count(string) for string in COMPARISON_OPERATORS)
+    if comparisons - 2 * len(names) >= 2:
+        return True
+    # An `expect` in the `else` branch of another is only evaluated on a `None`.
+    first_else = strings.index("else") if "else" in strings else len(strings)
+    return any(strings.index(name) > first_else for name in names)
+
+
+class _Scope:  # pylint: disable=too-few-public-methods
+    """A module or class body, whose temporaries are deleted by generated code."""
+
+    def __init__(self, depth: int, column: int):
+        # Indentation level and column of the statements directly in the body.
+        self.depth = depth
+        self.column = column
+        # Temporaries bound by the compound statement directly in the body that is
+        # being read, or `None` outside compound statements.
+        self.pending: Optional[Dict[str, None]] = None
+        # Whether the last statement directly in the body was a decorator.
+        self.decorated = False
+
+
+def _delete_temporaries(
+    tokens: List[TokenInfo], temporaries: FrozenSet[str], inserted_rows: List[int]
+) -> List[TokenInfo]:
+    """
+    Delete temporaries bound at module or class scope as soon as they are consumed.
+
+    Each simple statement directly in a module or class body that binds temporaries is
+    followed, on the same line, by `; del` of those temporaries. Where they might not be
+    bound, they are also bound to `None` before the statement so that the `del` cannot
+    fail. Temporaries bound anywhere in a compound statement are deleted once, by a
+    statement on a new row after it, so that loops do not delete them on each pass.
+    Later rows are shifted down and the added rows are added to `inserted_rows`.
+    """
+    module = _Scope(0, 0)
+    blocks: List[Optional[_Scope]] = []
+    keyword = ""
+    release_rows: List[int] = []
+    modified_tokens = []
+    for preamble, statement in _logical_lines(tokens):
+        modified_tokens.extend(
+            _enter_blocks(preamble, blocks, module, keyword, release_rows)
+        )
+        if not statement:
+            continue
+        scope = blocks[-1] if blocks else module
+        keyword = statement[0].string
+        if scope and scope.depth == len(blocks):
+            if keyword not in ("elif", "else", "except", "finally") and not (
+                scope.decorated
+            ):
+                modified_tokens.extend(_release(scope, statement[0], release_rows))
+                if _is_compound(statement):
+                    scope.pending = {}
+            scope.decorated = keyword == "@"
+        statement = [_add_offset(token, 0, len(release_rows)) for token in statement]
+        if statement[-1].type == NEWLINE and not statement[-1].string:
+            # The end of a source without a final newline, before which a release
+            # may be added.
+            statement[-1] = statement[-1]._replace(string="\n")
+        modified_tokens.extend(_delete_in_statement(statement, scope, temporaries))
+    inserted_rows[:] = sorted(
+        [row + bisect_right(release_rows, row) for row in inserted_rows]
+        + [row + index for index, row in enumerate(release_rows)]
+    )
+    return modified_tokens
+
+
+def _enter_blocks(
+    preamble: List[TokenInfo],
+    blocks: List[Optional[_Scope]],
+    module: _Scope,
+    keyword: str,
+    release_rows: List[int],
+) -> List[TokenInfo]:
+    """
+    Follow the blocks entered and left in the preamble of a statement.
+
+    `blocks` holds the scope of each enclosing block, with `None` for function bodies;
+    a block opened after a statement starting with `keyword` is pushed onto it. Pending
+    temporaries are released at the end of a class body or of the module.
+    """
+    modified_tokens = []
+    for token in preamble:
+        if token.type == INDENT:
+            if keyword == "class":
+                blocks.append(_Scope(len(blocks) + 1, token.end[1]))
+            elif keyword in ("async", "def"):
+                blocks.append(None)
+            else:
+                blocks.append(blocks[-1] if blocks else module)
+        elif token.type == DEDENT:
+            scope = blocks.pop()
+            if scope and scope.depth == len(blocks) + 1:
+                modified_tokens.extend(_release(scope, token, release_rows))
+        elif token.type == ENDMARKER:
+            modified_tokens.extend(_release(module, token, release_rows))
+        modified_tokens.append(_add_offset(token, 0, len(release_rows)))
+    return modified_tokens
+
+
+def _delete_in_statement(
+    statement: List[TokenInfo], scope: Optional[_Scope], temporaries: FrozenSet[str]
+) -> List[TokenInfo]:
+    """
+    Delete the temporaries a statement binds in `scope`, or add them to those pending.
+
+    The body of a one-line `class` is a scope of its own, so its temporaries are
+    deleted at the end of the line.
+    """
+    body = _body_start(statement)
+    if scope:
+        names = _temporaries_in(statement[:body], temporaries)
+        if scope.pending is None:
+            statement = _delete_after(statement, names, 0)
+        else:
+            scope.pending.update(dict.fromkeys(names))
+    if statement[0].string == "class":
+        names = _temporaries_in(statement[body:], temporaries)
+        statement = _delete_after(statement, names, body)
+    return statement
+
+
+def _temporaries_in(
+    statement: List[TokenInfo], temporaries: FrozenSet[str]
+) -> List[str]:
+    """Return the temporaries used in a statement, in order of first use."""
+    return list(
+        dict.fromkeys(
+            token.string
+            for token in statement
+            if token.type == NAME and token.string in temporaries
+        )
+    )
+
+
+def _body_start(statement: List[TokenInfo]) -> int:
+    """
+    Return the index at which the body of a one-line `def` or `class` statement starts.
+
+    The length of the statement is returned for other statements, whose body, if any,
+    is in the same scope as their header.
+    """
+    if statement[0].string not in ("async", "class", "def"):
+        return len(statement)
+    depth = 0
+    for index, token in enumerate(statement):
+        if token.type != OP:
+            continue
+        if token.string in ("(", "[", "{"):
+            depth += 1
+        elif token.string in (")", "]", "}"):
+            depth -= 1
+        elif token.string == ":" and not depth:
+            rest = [t for t in statement[index + 1 :] if t.type not in (COMMENT, NL)]
+            return index + 1 if rest and rest[0].type != NEWLINE else len(statement)
+    return len(statement)
+
+
+def _delete_after(
+    statement: List[TokenInfo], names: List[str], index: int
+) -> List[TokenInfo]:
+    """Delete `names` after the simple statements of `statement` from `index`."""
+    if not names:
+        return statement
+    may_skip_binding = _may_skip_binding(statement[index:], names)
+    statement = _append_delete(statement, names)
+    if may_skip_binding:
+        statement = _prepend_binding(statement, names, index)
+    return statement
+
+
+def _release(
+    scope: _Scope, before: TokenInfo, release_rows: List[int]
+) -> List[TokenInfo]:
+    """
+    Return a statement deleting the temporaries pending in `scope`, if there are any.
+
+    The statement is placed on a new row before the token `before`, which is appended
+    to `release_rows`, unshifted. The temporaries are first bound to `None`, as the
+    compound statement binding them may have skipped doing so.
+    """
+    names, scope.pending = scope.pending, None
+    if not names:
+        return []
+    parts = []
+    for name in names:
+        parts.extend([(NAME, name, 1), (OP, "=", 1)])
+    parts.extend([(NAME, "None", 1), (OP, ";", 0), (NAME, "del", 1)])
+    for index, name in enumerate(names):
+        if index:
+            parts.append((OP, ",", 0))
+        parts.append((NAME, name, 1))
+    parts.append((NEWLINE, "\n", 0))
+    row = before.start[0] + len(release_rows)
+    release_rows.append(before.start[0])
+    return _place(parts, (row, scope.column - 1), "")
+
+
+def _append_delete(statement: List[TokenInfo], names: List[str]) -> List[TokenInfo]:
+    """Append `; del <names>` to a statement, before any trailing comment."""
+    end = len(statement)
+    while end and statement[end - 1].type in (COMMENT, NEWLINE):
+        end -= 1
+    last = statement[end - 1]
+    parts = [] if last.type == OP and last.string == ";" else [(OP, ";", 0)]
+    parts.append((NAME, "del", 1))
+    for index, name in enumerate(names):
+        if index:
+            parts.append((OP, ",", 0))
+        parts.append((NAME, name, 1))
+    deletion = _place(parts, last.end, last.line)
+    width = deletion[-1].end[1] - last.end[1]
+    trailing = [
+        _add_offset(token, width) if token.start[0] == last.end[0] else token
+        for token in statement[end:]
+    ]
+    return statement[:end] + deletion + trailing
+
+
+def _prepend_binding(
+    statement: List[TokenInfo], names: List[str], index: int = 0
+) -> List[TokenInfo]:
+    """Insert `<names> = None;` before the token at `index` in a statement."""
+    first = statement[index]
+    parts = []
+    for name in names:
+        parts.extend([(NAME, name, 1), (OP, "=", 1)])
+    parts.extend([(NAME, "None", 1), (OP, ";", 0)])
+    binding = _place(parts, _pad_pos(first.start, -1), first.line)
+    width = binding[-1].end[1] + 1 - first.start[1]
+    return (
+        statement[:index]
+        + binding
+        + [
+            _add_offset(token, width) if token.start[0] == first.start[0] else token
+            for token in statement[index:]
+        ]
+    )
+
+
+def _restore_line_numbers(tree: ast.AST, inserted_rows: List[int]) -> None:
+    """
+    Map line numbers in `tree` back to the rows of the original source.
+
+    `inserted_rows` are the (sorted) rows of the modified source that do not exist in
+    the original, as recorded by `_modify_tokens`. Each maps onto the row before it, so
+    that the statement following an `expect.prop` check shares the check's line.
+    """
+    if not inserted_rows:
+        return
+    for node in ast.walk(tree):
+        if hasattr(node, "lineno"):
+            node.lineno -= bisect_right(inserted_rows, node.lineno)
+            if getattr(node, "end_lineno", None) is not None:
+                node.end_lineno -= bisect_right(inserted_rows, node.end_lineno)
+
+
+def _is_prop(tokens: List[TokenInfo], index: int) -> bool:
+    """Return whether `expect.prop` starts at `index` in `tokens`."""
+    return [(token.type, token.string) for token in tokens[index : index + 3]] == [
+        (NAME, "expect"),
+        (OP, "."),
+        (NAME, "prop"),
+    ]
+
+
+def _find_prop(statement: List[TokenInfo]) -> Optional[int]:
+    """Return the index of `expect.prop` in a statement, if it is used."""
+    found = None
+    depth = 0
+    for index, token in enumerate(statement):
+        if token.type == OP and token.string in "([{":
+            depth += 1
+        elif token.type == OP and token.string in ")]}":
+            depth -= 1
+        elif _is_prop(statement, index):
+            if depth or found is not None:
+                raise ExpectParse("expect.prop must end its statement.")
+            found = index
+    return found
+
+
+def _replace_prop(
+    tokens: List[TokenInfo], temporary_names: Iterator[str], inserted_rows: List[int]
+) -> List[TokenInfo]:
+    """
+    Replace each `expect.prop` with a check that returns if its operand is `None`.
+
+    Statements using `expect.prop` are rearranged by `_propagate`, which adds a row.
+    Later rows are shifted down and the added rows are appended to `inserted_rows`.
+    """
+    modified_tokens = []
+    row_shift = 0
+    for preamble, statement, in_function in _scoped_lines(tokens):
+        modified_tokens.extend(_add_offset(token, 0, row_shift) for token in preamble)
+        statement = [_add_offset(token, 0, row_shift) for token in statement]
+        index = _find_prop(statement)
+        if index is not None:
+            statement = _propagate(statement, index, next(temporary_names))
+            if not in_function:
+                raise ExpectParse("expect.prop must be used in a function.")
+            row_shift += 1
+            inserted_rows.append(statement[-1].start[0])
+        modified_tokens.extend(statement)
+    return modified_tokens
+
+
+def _propagate(statement: List[TokenInfo], index: int, name: str) -> List[TokenInfo]:
+    """
+    Rearrange a statement using `expect.prop` at `index` into a check and the statement.
+
+    Returns the tokens of:
+
+        if (name := operand) is None: return
+        prefix name
+
+    where `prefix` is the statement before `expect.prop` and `operand` the expression
+    after it. The statement is moved onto a new row after the check.
+    """
+    prefix, prop_token = statement[:index], statement[index]
+    operand, newline_token = statement[index + 3 : -1], statement[-1]
+    _check_prop_prefix(prefix, prop_token)
+    comments = []
+    while operand and operand[-1].type == COMMENT:
+        comments.insert(0, operand.pop())
+    if not operand:
+        raise ExpectParse("Missing expression after expect.prop.")
+    if any(token.type == OP and token.string == ";" for token in operand):
+        raise ExpectParse("expect.prop cannot be followed by ';'.")
+
+    check = _prop_check(operand, name, (prefix[0] if prefix else prop_token).start)
+    statement_row = check[-1].start[0] + 1
+    parts = [(NAME, name, 0)]
+    parts.extend((COMMENT, comment.string, 2) for comment in comments)
+    parts.append((NEWLINE, newline_token.string, 0))
+    rows = statement_row - prop_token.start[0]
+    return (
+        check
+        + [_add_offset(token, 0, rows) for token in prefix]
+        + _place(parts, (statement_row, prop_token.start[1]), prop_token.line)
+    )
+
+
+def _prop_check(
+    operand: List[TokenInfo], name: str, start: Tuple[int, int]
+) -> List[TokenInfo]:
+    """Return the tokens of `if (name := operand) is None: return` placed at `start`."""
+    line = operand[0].line
+    header = _place(
+        [(NAME, "if", 0), (OP, "(", 1), (NAME, name, 0), (OP, ":=", 1)], start, line
+    )
+    shift = header[-1].end[1] + 1 - operand[0].start[1]
+    operand = [
+        _add_offset(token, shift) if token.start[0] == start[0] else token
+        for token in operand
+    ]
+    tail = _place(
+        [
+            (OP, ")", 0),
+            (NAME, "is", 1),
+            (NAME, "None", 1),
+            (OP, ":", 0),
+            (NAME, "return", 1),
+            (NEWLINE, "\n", 0),
+        ],
+        operand[-1].end,
+        line,
+    )
+    return header + operand + tail
+
+
+def _check_prop_prefix(prefix: List[TokenInfo], prop_token: TokenInfo) -> None:
+    """Raise `ExpectParse` if `expect.prop` cannot follow `prefix` in a statement."""
+    if not prefix:
+        return
+    if prefix[0].type == NAME and prefix[0].string in COMPOUND_KEYWORDS:
+        raise ExpectParse("expect.prop cannot be in a compound statement.")
+    if any(token.type == OP and token.string == ";" for token in prefix):
+        raise ExpectParse("expect.prop cannot follow ';'.")
+    if any(token.start[0] != prop_token.start[0] for token in prefix):
+        raise ExpectParse("expect.prop must be on the first line of its statement.")
+    last = prefix[-1]
+    if not (
+        (last.type == OP and last.string == "=")
+        or (last.type == NAME and last.string == "return")
+    ):
+        raise ExpectParse("expect.prop must follow '=' or 'return'.")
+
+
+def _modify_tokens(
+    tokens: Iterable[TokenInfo], inserted_rows: Optional[List[int]] = None
+) -> List[TokenInfo]:
+    """
+    Modify a token stream to replace `except` with valid Python.
+
+    Rows of the modified stream that do not exist in the original are appended to
+    `inserted_rows`, if given.
+    """
+    tokens = list(tokens)
+    temporary_names = _temporary_names(_names(tokens))
     modified_tokens = []
 
     expect_nesting_level = 0
@@ -71,49 +702,55 @@ def _modify_tokens(tokens: Generator[TokenInfo, None, None]) -> List[TokenInfo]:
     last_row = 0
     conditional_statement_nesting = 0
     nesting = []
-    for token in tokens:
+    for index, token in enumerate(tokens):
         if token.start[0] != last_row:
             offset = 0
             last_row = token.start[0]
 
-        if token.type == NAME and token.string == "expect":
+        if _is_prop(tokens, index):
+            # Left in place for `_replace_prop`.
+            modified_tokens.append(_add_offset(token, offset))
+        elif token.type == NAME and token.string == "expect":
+            name = next(temporary_names)
+            width = len(name)
             # noinspection PyArgumentList
             pre = [
                 TokenInfo(
-                    NAME, "ret", token.start, _pad_pos(token.start, 3), token.line
+                    NAME, name, token.start, _pad_pos(token.start, width), token.line
                 ),
                 TokenInfo(
                     NAME,
                     "if",
-                    _pad_pos(token.start, 4),
-                    _pad_pos(token.start, 6),
+                    _pad_pos(token.start, width + 1),
+                    _pad_pos(token.start, width + 3),
                     token.line,
                 ),
                 TokenInfo(
                     OP,
                     "(",
-                    _pad_pos(token.start, 7),
-                    _pad_pos(token.start, 8),
+                    _pad_pos(token.start, width + 4),
+                    _pad_pos(token.start, width + 5),
                     token.line,
                 ),
                 TokenInfo(
                     NAME,
-                    "ret",
-                    _pad_pos(token.start, 8),
-                    _pad_pos(token.start, 11),
+                    name,
+                    _pad_pos(token.start, width + 5),
+                    _pad_pos(token.start, 2 * width + 5),
                     token.line,
                 ),
                 TokenInfo(
                     OP,
                     ":=",
-                    _pad_pos(token.start, 12),
-                    _pad_pos(token.start, 14),
+                    _pad_pos(token.start, 2 * width + 6),
+                    _pad_pos(token.start, 2 * width + 8),
                     token.line,
                 ),
             ]
             pre = [_add_offset(token, offset) for token in pre]
             modified_tokens.extend(pre)
-            offset += 8
+            # The replacement is `2 * width + 8` columns wide where `expect` was 6.
+            offset += 2 * width + 2
             nesting.append("expect")
 
         elif nesting and token.type == NEWLINE:
@@ -175,4 +812,6 @@ def _modify_tokens(tokens: Generator[TokenInfo, None, None]) -> List[TokenInfo]:
         else:
             modified_tokens.append(_add_offset(token, offset))
 
-    return modified_tokens
+    if inserted_rows is None:
+        inserted_rows = []
+    return _replace_prop(modified_tokens, temporary_names, inserted_rows)
@@ -1,7 +1,63 @@
+import os
 from io import BytesIO
+from pathlib import Path
 from tokenize import tokenize, untokenize
+from types import ModuleType
+from typing import Dict
 
-from expect.importer import _modify_tokens
+import expect
+from expect.importer import _modify_tokens, _tokens_to_module
+
+EXPECT_MODULE_SOURCE = '''
+class Record:
+    """A record."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def first(self):
+        """Return the first value, or 0."""
+        return expect self.values.get("first") else 0
+
+    def second(self):
+        """Return the second value, or None."""
+        value = expect.prop self.values.get("second")
+        return value
+'''
+
+PLAIN_MODULE_SOURCE = '''
+class Record:
+    """A record."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def first(self):
+        """Return the first value, or 0."""
+        ret = self.values.get("first")
+        return ret if ret is not None else 0
+
+    def second(self):
+        """Return the second value, or None."""
+        if (ret := self.values.get("second")) is None:
+            return
+        value = ret
+        return value
+'''
+
+
+def python_env(cwd: Path) -> Dict[str, str]:
+    """
+    Return an environment for a fresh interpreter with `cwd` and `expect` importable.
+
+    The cache is written next to the sources regardless of the calling environment.
+    """
+    package_dir = Path(expect.__file__).parent.parent
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(cwd), str(package_dir)]))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.pop("PYTHONPYCACHEPREFIX", None)
+    env.pop("EXPECTPYCACHEPREFIX", None)
+    return env
 
 
 def modify_string(src: str) -> str:
@@ -10,3 +66,11 @@ def modify_string(src: str) -> str:
     modified_tokens = _modify_tokens(tokenize(dummy_file_obj.readline))
     modified_str = untokenize(modified_tokens).decode("utf-8")
     return modified_str
+
+
+def src2mod(src: str) -> ModuleType:
+    """Convert a source string to a module."""
+    dummy_source_obj = BytesIO(src.strip("\r\n").encode("utf-8"))
+    dummy_source_tokens = tokenize(dummy_source_obj.readline)
+    dummy_module = _tokens_to_module(dummy_source_tokens, "dummy_module")
+    return dummy_module
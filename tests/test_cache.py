@@ -0,0 +1,240 @@
+"""Test the transform cache."""
+
+import hashlib
+import os
+import stat
+import subprocess
+import sys
+import time
+from collections import Counter
+from importlib import metadata
+
+import pytest
+
+from expect import cache
+from expect.importer import _source_to_code
+from .shared import EXPECT_MODULE_SOURCE, python_env
+
+SOURCE = b"""
+a = expect None else 1
+"""
+
+
+def test_cache_path_per_optimization_level(monkeypatch):
+    monkeypatch.setattr(cache, "prefix", None)
+    tag = sys.implementation.cache_tag
+    source_path = os.path.abspath(os.path.join("pkg", "mod.py"))
+    paths = [cache.cache_path(source_path, SOURCE, level) for level in range(3)]
+    directory = os.path.abspath(os.path.join("pkg", "__pycache__"))
+    name = f"mod.{tag}.expect-{cache.TRANSFORMER_VERSION}"
+    assert paths == [
+        os.path.join(directory, f"{name}.pyc"),
+        os.path.join(directory, f"{name}.opt-1.pyc"),
+        os.path.join(directory, f"{name}.opt-2.pyc"),
+    ]
+
+
+def test_cache_path_with_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "prefix", str(tmp_path / "prefix"))
+    source_path = os.path.abspath(os.path.join("pkg", "mod.py"))
+    path = cache.cache_path(source_path, SOURCE, 0)
+    source_dir = os.path.splitdrive(os.path.dirname(source_path))[1]
+    expected_dir = os.path.join(str(tmp_path / "prefix"), source_dir.lstrip(os.sep))
+    assert os.path.dirname(path) == expected_dir
+    digest = hashlib.sha256(SOURCE).hexdigest()[:32]
+    assert os.path.basename(path).startswith(f"mod.{digest}.")
+
+
+def test_cache_path_is_content_addressed_with_prefix(tmp_path, monkeypatch):
+    source_path = os.path.join("pkg", "mod.py")
+    changed_source = SOURCE + b"b = 2\n"
+    monkeypatch.setattr(cache, "prefix", str(tmp_path / "prefix"))
+    assert cache.cache_path(source_path, SOURCE, 0) != cache.cache_path(
+        source_path, changed_source, 0
+    )
+    monkeypatch.setattr(cache, "prefix", None)
+    assert cache.cache_path(source_path, SOURCE, 0) == cache.cache_path(
+        source_path, changed_source, 0
+    )
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    path = str(tmp_path / "__pycache__" / "mod.pyc")
+    entry = _source_to_code(SOURCE, "mod.py")
+    cache.write(path, SOURCE, entry)
+    code, temporaries = cache.read(path, SOURCE)
+    assert code == entry[0]
+    assert temporaries == entry[1] == frozenset({"__expect_0__"})
+    assert os.listdir(tmp_path / "__pycache__") == ["mod.pyc"]
+
+
+def test_changed_source_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    path = str(tmp_path / "__pycache__" / "mod.pyc")
+    cache.write(path, SOURCE, _source_to_code(SOURCE, "mod.py"))
+    assert cache.read(path, SOURCE + b"b = 2\n") is None
+
+
+def test_other_transformer_version_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    source_path = str(tmp_path / "mod.py")
+    path = cache.cache_path(source_path, SOURCE, 0)
+    cache.write(path, SOURCE, _source_to_code(SOURCE, "mod.py"))
+    monkeypatch.setattr(cache, "TRANSFORMER_VERSION", "0" * 16)
+    assert cache.cache_path(source_path, SOURCE, 0) != path
+    assert cache.read(path, SOURCE) is None
+
+
+def test_transformer_version_without_source_or_metadata(tmp_path, monkeypatch):
+    def not_installed(name):
+        raise metadata.PackageNotFoundError(name)
+
+    monkeypatch.setattr(cache, "__file__", str(tmp_path / "missing" / "cache.py"))
+    monkeypatch.setattr(metadata, "version", not_installed)
+    version = cache._transformer_version()  # pylint: disable=protected-access
+    assert len(version) == 16 and int(version, 16) >= 0
+
+
+def test_import_does_not_load_metadata(tmp_path):
+    code = "import sys, expect; print('importlib.metadata' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=tmp_path,
+        env=python_env(tmp_path),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == ["False"]
+
+
+def test_changed_source_replaces_its_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    monkeypatch.setattr(cache, "prefix", None)
+    source_path = str(tmp_path / "mod.py")
+    for source in (SOURCE, SOURCE + b"b = 2\n"):
+        path = cache.cache_path(source_path, source, 0)
+        cache.write(path, source, _source_to_code(source, "mod.py"))
+    assert os.listdir(tmp_path / "__pycache__") == [os.path.basename(path)]
+    assert cache.read(path, source) is not None
+
+
+def test_other_transformer_versions_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    monkeypatch.setattr(cache, "prefix", None)
+    source_path = str(tmp_path / "mod.py")
+    monkeypatch.setattr(cache, "TRANSFORMER_VERSION", "0" * 16)
+    stale = cache.cache_path(source_path, SOURCE, 0)
+    kept = [
+        stale.replace(".pyc", ".opt-1.pyc"),
+        stale.replace("mod.", "other_mod."),
+        str(tmp_path / "__pycache__" / "mod.pyc"),
+    ]
+    for path in [stale, *kept]:
+        cache.write(path, SOURCE, _source_to_code(SOURCE, "mod.py"))
+    monkeypatch.setattr(cache, "TRANSFORMER_VERSION", "1" * 16)
+    path = cache.cache_path(source_path, SOURCE, 0)
+    cache.write(path, SOURCE, _source_to_code(SOURCE, "mod.py"))
+    assert sorted(os.listdir(tmp_path / "__pycache__")) == sorted(
+        os.path.basename(path) for path in [path, *kept]
+    )
+
+
+def test_missing_or_corrupt_entry_is_a_miss(tmp_path):
+    path = tmp_path / "mod.pyc"
+    assert cache.read(str(path), SOURCE) is None
+    path.write_bytes(b"not a cache entry")
+    assert cache.read(str(path), SOURCE) is None
+
+
+def test_dont_write_bytecode(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    path = str(tmp_path / "__pycache__" / "mod.pyc")
+    cache.write(path, SOURCE, _source_to_code(SOURCE, "mod.py"))
+    assert not os.path.exists(path)
+
+
+@pytest.mark.skipif(cache.fcntl is None, reason="Requires fcntl")
+def test_lock_per_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    monkeypatch.setattr(cache, "prefix", None)
+    for name in ("a.py", "b.py"):
+        path = cache.cache_path(str(tmp_path / name), SOURCE, 0)
+        with cache.lock(path):
+            cache.write(path, SOURCE, _source_to_code(SOURCE, name))
+    names = os.listdir(tmp_path / "__pycache__")
+    assert len(names) == 3
+    assert cache.LOCK_NAME in names
+
+
+@pytest.mark.skipif(cache.fcntl is None, reason="Requires fcntl")
+def test_prefix_is_shared_with_the_group(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    prefix = tmp_path / "cache"
+    monkeypatch.setattr(cache, "prefix", str(prefix))
+    path = cache.cache_path(str(tmp_path / "pkg" / "mod.py"), SOURCE, 0)
+    umask = os.umask(0o077)
+    try:
+        with cache.lock(path):
+            cache.write(path, SOURCE, _source_to_code(SOURCE, "mod.py"))
+    finally:
+        os.umask(umask)
+    directories = [prefix]
+    directory = os.path.dirname(path)
+    while directory != str(prefix):
+        directories.append(directory)
+        directory = os.path.dirname(directory)
+    for directory in directories:
+        mode = stat.S_IMODE(os.stat(directory).st_mode)
+        assert mode == cache.SHARED_DIRECTORY_MODE
+    for file in (path, os.path.join(os.path.dirname(path), cache.LOCK_NAME)):
+        assert stat.S_IMODE(os.stat(file).st_mode) == cache.SHARED_FILE_MODE
+
+
+@pytest.mark.skipif(cache.fcntl is None, reason="Requires fcntl")
+def test_concurrent_imports_transform_once(tmp_path):
+    n_processes = 16
+    n_modules = 5
+    for index in range(n_modules):
+        (tmp_path / f"shared_mod_{index}.py").write_text(EXPECT_MODULE_SOURCE)
+    go = tmp_path / "go"
+    log = tmp_path / "transforms.log"
+    code = f"""
+import os
+import time
+
+import expect
+from expect import importer
+
+source_to_code = importer._source_to_code
+
+
+def logged_source_to_code(source, filename):
+    with open({str(log)!r}, "a") as f:
+        f.write(os.path.basename(filename) + "\\n")
+    return source_to_code(source, filename)
+
+
+importer._source_to_code = logged_source_to_code
+while not os.path.exists({str(go)!r}):
+    time.sleep(0.001)
+for index in range({n_modules}):
+    module = expect.expect_import(f"shared_mod_{{index}}")
+    assert module.Record({{}}).first() == 0
+"""
+    env = python_env(tmp_path)
+    env["EXPECTPYCACHEPREFIX"] = str(tmp_path / "cache")
+    processes = [
+        subprocess.Popen([sys.executable, "-c", code], cwd=tmp_path, env=env)
+        for _ in range(n_processes)
+    ]
+    time.sleep(0.5)
+    go.touch()
+    assert [process.wait(timeout=60) for process in processes] == [0] * n_processes
+
+    transforms = Counter(log.read_text().split())
+    assert transforms == {f"shared_mod_{index}.py": 1 for index in range(n_modules)}
+    cached = [name for _, _, names in os.walk(tmp_path / "cache") for name in names]
+    assert not [name for name in cached if name.endswith(".tmp")]
+    assert len([name for name in cached if name.endswith(".pyc")]) == n_modules
@@ -23,7 +23,7 @@ class TestConditionalExpression:
 a, b = expect None else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := None) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := None) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -35,7 +35,7 @@ a, b = ret if (ret := None) is not None else (0, 0)
 a, b = expect 1 else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := 1) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := 1) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -47,7 +47,7 @@ a, b = ret if (ret := 1) is not None else (0, 0)
 a, b = expect 0 else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := 0) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := 0) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -59,7 +59,7 @@ a, b = ret if (ret := 0) is not None else (0, 0)
 a, b = expect func_2_tuple() else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := func_2_tuple()) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := func_2_tuple()) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -72,7 +72,7 @@ a, b = expect \
     func_2_tuple() else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := \
+a, b = __expect_0__ if (__expect_0__ := \
     func_2_tuple()) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
@@ -89,7 +89,7 @@ a, b = (
 """
         expected_str = """
 a, b = (
-    ret if (ret :=
+    __expect_0__ if (__expect_0__ :=
     func_2_tuple()) is not None else (0, 0)
 )
 """
@@ -116,7 +116,7 @@ a, b = expect
 a, b = expect (func_2_tuple()) else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := (func_2_tuple())) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := (func_2_tuple())) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -128,7 +128,7 @@ a, b = ret if (ret := (func_2_tuple())) is not None else (0, 0)
 a, b = expect (1, 1) if something else None else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := (1, 1) if something else None) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := (1, 1) if something else None) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -140,7 +140,7 @@ a, b = ret if (ret := (1, 1) if something else None) is not None else (0, 0)
 a, b = expect (1, 1) if something else None if something_else else None else (0, 0)
 """
         expected_str = """
-a, b = ret if (ret := (1, 1) if something else None if something_else else None) is not None else (0, 0)
+a, b = __expect_0__ if (__expect_0__ := (1, 1) if something else None if something_else else None) is not None else (0, 0)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -160,9 +160,9 @@ a, b = expect expect func_2_tuple() else (0, 0) else (1, 1)
 """
 
         # first step:
-        # a, b = ret if (ret := expect func_2_tuple() else (0, 0)) is not None else (1, 1)
+        # a, b = __expect_0__ if (__expect_0__ := expect func_2_tuple() else (0, 0)) is not None else (1, 1)
         expected_str = """
-a, b = ret if (ret := ret if (ret := func_2_tuple()) is not None else (0, 0)) is not None else (1, 1)
+a, b = __expect_0__ if (__expect_0__ := __expect_1__ if (__expect_1__ := func_2_tuple()) is not None else (0, 0)) is not None else (1, 1)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -172,7 +172,7 @@ a, b = ret if (ret := ret if (ret := func_2_tuple()) is not None else (0, 0)) is
 a, b = expect (expect func_2_tuple() else (0, 0)) else (1, 1)
 """
         expected_str = """
-a, b = ret if (ret := (ret if (ret := func_2_tuple()) is not None else (0, 0))) is not None else (1, 1)
+a, b = __expect_0__ if (__expect_0__ := (__expect_1__ if (__expect_1__ := func_2_tuple()) is not None else (0, 0))) is not None else (1, 1)
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -182,7 +182,7 @@ a, b = ret if (ret := (ret if (ret := func_2_tuple()) is not None else (0, 0)))
 a, b = (expect expect func_2_tuple() else (0, 0) else (1, 1))
 """
         expected_str = """
-a, b = (ret if (ret := ret if (ret := func_2_tuple()) is not None else (0, 0)) is not None else (1, 1))
+a, b = (__expect_0__ if (__expect_0__ := __expect_1__ if (__expect_1__ := func_2_tuple()) is not None else (0, 0)) is not None else (1, 1))
 """
         modified_str = modify_string(in_str)
         assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
@@ -195,7 +195,7 @@ if expect f() else True:
     pass
 """
         expected_str = """
-if ret if (ret := f()) is not None else True:
+if __expect_0__ if (__expect_0__ := f()) is not None else True:
     pass
 """
         modified_str = modify_string(in_str)
@@ -207,7 +207,7 @@ if (expect f() else True):
     pass
 """
         expected_str = """
-if (ret if (ret := f()) is not None else True):
+if (__expect_0__ if (__expect_0__ := f()) is not None else True):
     pass
 """
         modified_str = modify_string(in_str)
@@ -218,7 +218,7 @@ if expect (f()) else True:
     pass
 """
         expected_str = """
-if ret if (ret := (f())) is not None else True:
+if __expect_0__ if (__expect_0__ := (f())) is not None else True:
     pass
 """
         modified_str = modify_string(in_str)
@@ -250,7 +250,7 @@ if (a := expect f() else True):
     pass
 """
         expected_str = """
-if (a := ret if (ret := f()) is not None else True):
+if (a := __expect_0__ if (__expect_0__ := f()) is not None else True):
     pass
 """
         modified_str = modify_string(in_str)
@@ -262,7 +262,7 @@ if ((a := expect f() else True)):
     pass
 """
         expected_str = """
-if ((a := ret if (ret := f()) is not None else True)):
+if ((a := __expect_0__ if (__expect_0__ := f()) is not None else True)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -273,7 +273,7 @@ if (a := expect (f()) else True):
     pass
 """
         expected_str = """
-if (a := ret if (ret := (f())) is not None else True):
+if (a := __expect_0__ if (__expect_0__ := (f())) is not None else True):
     pass
 """
         modified_str = modify_string(in_str)
@@ -285,7 +285,7 @@ if (a := (expect f() else True)):
     pass
 """
         expected_str = """
-if (a := (ret if (ret := f()) is not None else True)):
+if (a := (__expect_0__ if (__expect_0__ := f()) is not None else True)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -316,7 +316,7 @@ if (expect f() else 1 for _ in range(n)):
     pass
 """
         expected_str = """
-if (ret if (ret := f()) is not None else 1 for _ in range(n)):
+if (__expect_0__ if (__expect_0__ := f()) is not None else 1 for _ in range(n)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -330,7 +330,7 @@ if ((expect f() else 1 for _ in range(n))):
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1 for _ in range(n))):
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1 for _ in range(n))):
     pass
 """
         modified_str = modify_string(in_str)
@@ -342,7 +342,7 @@ if ((expect f() else 1) for _ in range(n)):
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1) for _ in range(n)):
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1) for _ in range(n)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -356,7 +356,7 @@ if (expect f() else 1,):
     pass
 """
         expected_str = """
-if (ret if (ret := f()) is not None else 1,):
+if (__expect_0__ if (__expect_0__ := f()) is not None else 1,):
     pass
 """
         modified_str = modify_string(in_str)
@@ -368,7 +368,7 @@ if (expect f() else 1, expect f() else 1):
     pass
 """
         expected_str = """
-if (ret if (ret := f()) is not None else 1, ret if (ret := f()) is not None else 1):
+if (__expect_0__ if (__expect_0__ := f()) is not None else 1, __expect_1__ if (__expect_1__ := f()) is not None else 1):
     pass
 """
         modified_str = modify_string(in_str)
@@ -380,7 +380,7 @@ if (expect f() else 1,) * n:
     pass
 """
         expected_str = """
-if (ret if (ret := f()) is not None else 1,) * n:
+if (__expect_0__ if (__expect_0__ := f()) is not None else 1,) * n:
     pass
 """
         modified_str = modify_string(in_str)
@@ -394,7 +394,7 @@ if ((expect f() else 1,)):
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1,)):
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1,)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -406,7 +406,7 @@ if ((expect f() else 1, expect f() else 1)):
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1, ret if (ret := f()) is not None else 1)):
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1, __expect_1__ if (__expect_1__ := f()) is not None else 1)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -418,7 +418,7 @@ if ((expect f() else 1), (expect f() else 1)):
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1), (ret if (ret := f()) is not None else 1)):
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1), (__expect_1__ if (__expect_1__ := f()) is not None else 1)):
     pass
 """
         modified_str = modify_string(in_str)
@@ -430,7 +430,7 @@ if ((expect f() else 1,) * n):
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1,) * n):
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1,) * n):
     pass
 """
         modified_str = modify_string(in_str)
@@ -442,7 +442,7 @@ if ((expect f() else 1),) * n:
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1),) * n:
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1),) * n:
     pass
 """
         modified_str = modify_string(in_str)
@@ -454,7 +454,7 @@ if ((expect f() else 1,)) * n:
     pass
 """
         expected_str = """
-if ((ret if (ret := f()) is not None else 1,)) * n:
+if ((__expect_0__ if (__expect_0__ := f()) is not None else 1,)) * n:
     pass
 """
         modified_str = modify_string(in_str)
@@ -5,11 +5,18 @@ The tests should cover use of redundant symbols - e.g. unnecessary parentheses,
 continuation using "\" etc.
 """
 
-from io import BytesIO
-from tokenize import tokenize
-from types import ModuleType
+import dis
+import os
+import subprocess
+import sys
+from pathlib import Path
 
-from expect.importer import _modify_tokens, _tokens_to_module
+import pytest
+
+import expect
+from expect import cache
+from expect.importer import TEMPORARY_PREFIX, _source_to_code
+from .shared import EXPECT_MODULE_SOURCE, PLAIN_MODULE_SOURCE, python_env, src2mod
 
 
 # TODO: Import a standard library file using expect_import and check that the module
@@ -34,15 +41,315 @@ def main():
 """
 
 
-def _src2mod(src: str) -> ModuleType:
-    """Convert a source string to a module."""
-    dummy_source_obj = BytesIO(src.strip("\r\n").encode("utf-8"))
-    dummy_source_tokens = tokenize(dummy_source_obj.readline)
-    dummy_module = _tokens_to_module(dummy_source_tokens, "dummy_module")
-    return dummy_module
-
-
 # TODO: Test more constructs.
 def test_importer():
-    dummy_module = _src2mod(DUMMY_MODULE_SOURCE)
+    dummy_module = src2mod(DUMMY_MODULE_SOURCE)
     assert dummy_module.main() == (1, 2)  # pylint: disable=no-member
+
+
+def test_temporaries_do_not_clobber_user_names():
+    dummy_module = src2mod(
+        """
+ret = "user value"
+__expect_0__ = "also a user value"
+a = expect None else 1
+b = expect 2 else 3
+"""
+    )
+    assert dummy_module.ret == "user value"  # pylint: disable=no-member
+    assert dummy_module.__expect_0__ == "also a user value"  # pylint: disable=no-member
+    assert (dummy_module.a, dummy_module.b) == (1, 2)  # pylint: disable=no-member
+
+
+def test_temporaries_are_released_at_module_and_class_scope():
+    dummy_module = src2mod(
+        """
+import weakref
+
+
+class Big:
+    pass
+
+
+def make():
+    return Big()
+
+
+value = expect make() else None
+ref = weakref.ref(value)
+del value
+
+
+class Holder:
+    attr = expect 1 else 2
+
+    class Inner:
+        attr = expect 3 else 4
+"""
+    )
+    assert dummy_module.ref() is None  # pylint: disable=no-member
+    names = set(vars(dummy_module))
+    names |= set(vars(dummy_module.Holder))  # pylint: disable=no-member
+    names |= set(vars(dummy_module.Holder.Inner))  # pylint: disable=no-member
+    assert not any(name.startswith(TEMPORARY_PREFIX) for name in names)
+
+
+def test_temporaries_are_released_after_their_statement():
+    dummy_module = src2mod(
+        """
+import weakref
+
+
+class Big:
+    pass
+
+
+value = expect Big() else None
+ref = weakref.ref(value)
+del value
+released = ref() is None
+"""
+    )
+    assert dummy_module.released  # pylint: disable=no-member
+
+
+def test_temporaries_that_may_not_be_bound():
+    dummy_module = src2mod(
+        """
+f = lambda: expect None else 1
+g = [expect x else 0 for x in ()]
+if expect None else 1:
+    h = expect None else 2 if f() else 3
+i = 1 > 2 < (expect None else 3)
+for _ in ():
+    j = expect None else 4
+"""
+    )
+    assert dummy_module.f() == 1  # pylint: disable=no-member
+    assert (dummy_module.g, dummy_module.h) == ([], 2)  # pylint: disable=no-member
+    assert dummy_module.i is False  # pylint: disable=no-member
+    assert not any(name.startswith(TEMPORARY_PREFIX) for name in vars(dummy_module))
+
+
+def test_temporaries_are_released_after_compound_statements():
+    source = """
+import weakref
+
+
+class Big:
+    pass
+
+
+refs = []
+for i in range(3):
+    value = expect Big() else None
+    refs.append(weakref.ref(value))
+    if i:
+        other = expect None else i
+del value
+released = [ref() for ref in refs] == [None] * 3
+"""
+    code, _ = _source_to_code(source.encode("utf-8"), "<string>")
+    instructions = list(dis.get_instructions(code))
+    loop_exit = next(
+        instruction.argval
+        for instruction in instructions
+        if instruction.opname == "FOR_ITER"
+    )
+    deletions = [
+        instruction.offset
+        for instruction in instructions
+        if instruction.opname == "DELETE_NAME"
+        and instruction.argval.startswith(TEMPORARY_PREFIX)
+    ]
+    # Deleted once after the loop rather than on each pass.
+    assert len(deletions) == 2
+    assert min(deletions) >= loop_exit
+    dummy_module = src2mod(source)
+    assert dummy_module.released  # pylint: disable=no-member
+    assert dummy_module.other == 2  # pylint: disable=no-member
+
+
+def test_temporaries_in_class_compound_statements():
+    dummy_module = src2mod(
+        """
+class Header:
+    if expect None else 1:
+        pass
+
+
+class Body:
+    if True: a = expect None else 1
+
+
+class OneLine: a = expect None else 1
+
+
+class Nested:
+    for _ in range(1):
+        class Inner:
+            a = expect None else 1
+"""
+    )
+    classes = [
+        getattr(dummy_module, name) for name in ("Header", "Body", "OneLine", "Nested")
+    ]
+    classes.append(dummy_module.Nested.Inner)  # pylint: disable=no-member
+    assert [getattr(cls, "a", 1) for cls in classes] == [1] * 5
+    names = {name for cls in classes for name in vars(cls)}
+    assert not any(name.startswith(TEMPORARY_PREFIX) for name in names)
+
+
+def test_temporaries_in_enum():
+    dummy_module = src2mod(
+        """
+from enum import Enum
+
+
+class Color(Enum):
+    RED = expect None else 1
+    GREEN = expect 2 else 3
+"""
+    )
+    color = dummy_module.Color  # pylint: disable=no-member
+    assert [(member.name, member.value) for member in color] == [
+        ("RED", 1),
+        ("GREEN", 2),
+    ]
+
+
+def test_temporaries_in_guarded_and_local_classes():
+    dummy_module = src2mod(
+        """
+class Meta(type):
+    def __delattr__(cls, name):
+        raise TypeError("read-only")
+
+
+class Guarded(metaclass=Meta):
+    a = expect None else 1
+
+
+def make():
+    class Local:
+        b = expect None else 2
+
+    return Local
+"""
+    )
+    guarded = dummy_module.Guarded  # pylint: disable=no-member
+    local = dummy_module.make()  # pylint: disable=no-member
+    assert (guarded.a, local.b) == (1, 2)
+    names = set(vars(guarded)) | set(vars(local))
+    assert not any(name.startswith(TEMPORARY_PREFIX) for name in names)
+
+
+def test_function_temporaries_are_locals():
+    dummy_module = src2mod(
+        """
+def main():
+    a = expect None else 1
+    b = expect 2 else 3
+    return a, b
+"""
+    )
+    main = dummy_module.main  # pylint: disable=no-member
+    assert main() == (1, 2)
+    assert {"__expect_0__", "__expect_1__"} <= set(main.__code__.co_varnames)
+
+
+OPTIMIZED_MODULE_SOURCE = '''
+"""Module docstring."""
+
+a = expect None else 1
+assert a == 2
+'''
+
+
+def _run_python(code: str, cwd: Path, *flags: str) -> str:
+    """Run `code` in a fresh interpreter with `cwd` and `expect` importable."""
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=cwd,
+        env=python_env(cwd),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def test_expect_import(tmp_path, monkeypatch):
+    (tmp_path / "dummy_expect_module.py").write_text(DUMMY_MODULE_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "dummy_expect_module", raising=False)
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    module = expect.expect_import("dummy_expect_module")
+    assert module.main() == (1, 2)
+    assert sys.modules["dummy_expect_module"] is module
+    source_path = tmp_path / "dummy_expect_module.py"
+    cached = cache.cache_path(str(source_path), source_path.read_bytes(), 0)
+    assert os.path.exists(cached)
+
+
+@pytest.mark.parametrize("level", [0, 1, 2])
+def test_optimization_level(tmp_path, monkeypatch, level):
+    monkeypatch.setattr(cache, "prefix", None)
+    (tmp_path / "optimized.py").write_text(OPTIMIZED_MODULE_SOURCE)
+    code = """
+import expect
+try:
+    module = expect.expect_import("optimized")
+except AssertionError:
+    print("assert")
+else:
+    print(module.__doc__)
+"""
+    flags = ("-" + "O" * level,) if level else ()
+    # Run twice so that the second run loads the cache entry for this level.
+    for _ in range(2):
+        output = _run_python(code, tmp_path, *flags).strip()
+        assert output == ["assert", "Module docstring.", "None"][level]
+    source_path = tmp_path / "optimized.py"
+    for other_level in range(3):
+        path = cache.cache_path(str(source_path), source_path.read_bytes(), other_level)
+        assert os.path.exists(path) == (other_level == level)
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/proc/self/statm"), reason="Requires /proc/self/statm"
+)
+def test_memory_footprint(tmp_path):
+    n_modules = 200
+    for index in range(n_modules):
+        (tmp_path / f"expect_mod_{index}.py").write_text(EXPECT_MODULE_SOURCE)
+        (tmp_path / f"plain_mod_{index}.py").write_text(PLAIN_MODULE_SOURCE)
+    code = f"""
+import gc
+import importlib
+import os
+
+import expect
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def resident():
+    gc.collect()
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+start = resident()
+for index in range({n_modules}):
+    importlib.import_module(f"plain_mod_{{index}}")
+middle = resident()
+for index in range({n_modules}):
+    expect.expect_import(f"expect_mod_{{index}}")
+end = resident()
+print(middle - start, end - middle)
+"""
+    # The first run populates the cache; the second measures loads from it.
+    for _ in range(2):
+        plain, with_expect = map(int, _run_python(code, tmp_path).split())
+        assert with_expect <= 1.5 * plain + 512 * 1024
@@ -0,0 +1,180 @@
+"""
+Test `expect.prop` None propagation.
+
+The tests should cover use of redundant symbols - e.g. unnecessary parentheses, line
+continuation using "\" etc.
+"""
+
+import ast
+import dis
+import traceback
+
+import pytest
+
+from expect import ExpectParse
+from .shared import modify_string, src2mod
+
+
+class TestProp:
+    @staticmethod
+    def test_assignment():
+        in_str = """
+def f():
+    a, b = expect.prop func_2_tuple()
+"""
+        expected_str = """
+def f():
+    if (__expect_0__ := func_2_tuple()) is None: return
+    a, b = __expect_0__
+"""
+        modified_str = modify_string(in_str)
+        assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
+        assert ast.dump(ast.parse(modified_str)) == ast.dump(ast.parse(expected_str))
+
+    @staticmethod
+    def test_return():
+        in_str = """
+def f():
+    return expect.prop func_2_tuple()
+"""
+        expected_str = """
+def f():
+    if (__expect_0__ := func_2_tuple()) is None: return
+    return __expect_0__
+"""
+        modified_str = modify_string(in_str)
+        assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
+        assert ast.dump(ast.parse(modified_str)) == ast.dump(ast.parse(expected_str))
+
+    @staticmethod
+    def test_trailing_comment():
+        in_str = """
+def f():
+    a = expect.prop g()  # comment
+"""
+        expected_str = """
+def f():
+    if (__expect_0__ := g()) is None: return
+    a = __expect_0__  # comment
+"""
+        modified_str = modify_string(in_str)
+        assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
+        assert ast.dump(ast.parse(modified_str)) == ast.dump(ast.parse(expected_str))
+
+    @staticmethod
+    def test_multiline_operand():
+        in_str = """
+def f():
+    a = expect.prop g(
+        1, 2)
+    return a
+"""
+        expected_str = """
+def f():
+    if (__expect_0__ := g(
+        1, 2)) is None: return
+    a = __expect_0__
+    return a
+"""
+        modified_str = modify_string(in_str)
+        assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
+        assert ast.dump(ast.parse(modified_str)) == ast.dump(ast.parse(expected_str))
+
+    @staticmethod
+    def test_operand_is_expect():
+        in_str = """
+def f():
+    a = expect.prop expect g() else h()
+"""
+        expected_str = """
+def f():
+    if (__expect_1__ := __expect_0__ if (__expect_0__ := g()) is not None else h()) is None: return
+    a = __expect_1__
+"""
+        modified_str = modify_string(in_str)
+        assert modified_str.strip("\r\n") == expected_str.strip("\r\n")
+        assert ast.dump(ast.parse(modified_str)) == ast.dump(ast.parse(expected_str))
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "in_str, message",
+        [
+            ("a = g(expect.prop f())", "expect.prop must end its statement."),
+            ("a = (expect.prop f())", "expect.prop must end its statement."),
+            ("a = 1 + expect.prop f()", "expect.prop must follow '=' or 'return'."),
+            (
+                "if expect.prop f(): pass",
+                "expect.prop cannot be in a compound statement.",
+            ),
+            ("a = 1; b = expect.prop f()", "expect.prop cannot follow ';'."),
+            ("a = expect.prop", "Missing expression after expect.prop."),
+            ("a = expect.prop g(); return a", "expect.prop cannot be followed by ';'."),
+        ],
+    )
+    def test_invalid_use_raises(in_str, message):
+        with pytest.raises(ExpectParse) as exc_info:
+            modify_string(f"def f():\n    {in_str}")
+        assert str(exc_info.value) == message
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "in_str",
+        [
+            "a = expect.prop f()",
+            "class C:\n    a = expect.prop f()",
+            "def f():\n    class C:\n        a = expect.prop f()",
+        ],
+    )
+    def test_outside_function_raises(in_str):
+        with pytest.raises(ExpectParse) as exc_info:
+            modify_string(in_str)
+        assert str(exc_info.value) == "expect.prop must be used in a function."
+
+
+PARSER_SOURCE = """
+def get(mapping, key):
+    return mapping.get(key)
+
+
+def parse(config):
+    a = expect.prop get(config, "a")
+    b = expect.prop get(a, "b")
+    c = expect.prop get(b, "c")
+    return c
+
+
+def fail():
+    a = expect.prop get({"a": 1}, "a")
+    raise ValueError(a)
+"""
+
+
+def test_prop_propagates_none():
+    module = src2mod(PARSER_SOURCE)
+    assert module.parse({}) is None  # pylint: disable=no-member
+    assert module.parse({"a": {}}) is None  # pylint: disable=no-member
+    assert module.parse({"a": {"b": {}}}) is None  # pylint: disable=no-member
+    assert module.parse({"a": {"b": {"c": 0}}}) == 0  # pylint: disable=no-member
+
+
+def test_prop_chain_is_one_comparison_each():
+    module = src2mod(PARSER_SOURCE)
+    parse = module.parse  # pylint: disable=no-member
+    # Python 3.8 compiles `is` to a comparison rather than to `IS_OP`.
+    none_checks = [
+        instruction
+        for instruction in dis.get_instructions(parse)
+        if "NONE" in instruction.opname
+        or instruction.opname == "IS_OP"
+        or (instruction.opname == "COMPARE_OP" and instruction.argval == "is")
+    ]
+    assert len(none_checks) == 3
+
+
+def test_prop_preserves_line_numbers():
+    module = src2mod(PARSER_SOURCE)
+    with pytest.raises(ValueError) as exc_info:
+        module.fail()  # pylint: disable=no-member
+    frame = traceback.extract_tb(exc_info.tb)[-1]
+    assert frame.name == "fail"
+    assert frame.lineno == 14